@@ -4,18 +4,20 @@ MarketPredictor AI Training - Обучение модели для анализ
 """
 
 import os
+import argparse
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 from datetime import datetime, timedelta
 import requests
 import joblib
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 from sklearn.pipeline import Pipeline
+from threadpoolctl import threadpool_limits
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras.models import Sequential
@@ -25,6 +27,12 @@ import json
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import tqdm
+from reporting import ReportRunner, lttb_downsample
+from feature_importance import PermutationImportance, save_importances
+from retrain_policy import RetrainPolicy
+from training_orchestrator import TrainingOrchestrator
+from compiled_forest import CompiledForest
+from ensemble import EnsemblePredictor
 
 
 np.random.seed(42)
@@ -35,6 +43,15 @@ class MarketDataProcessor:
     Класс для загрузки и обработки рыночных данных EURUSD
     """
     
+    # Признаки, на которых обучаются модели
+    FEATURE_COLUMNS = [
+        'open', 'high', 'low', 'close', 'volume',
+        'sma5', 'sma20', 'sma50', 'ema12', 'ema26',
+        'macd', 'macd_signal', 'macd_hist',
+        'rsi', 'bb_middle', 'bb_std', 'bb_upper', 'bb_lower',
+        'stoch_k', 'stoch_d', 'atr', 'momentum', 'pct_change'
+    ]
+    
     def __init__(self, data_dir='data'):
         """Инициализация с указанием директории для данных"""
         self.data_dir = data_dir
@@ -168,9 +185,11 @@ class MarketDataProcessor:
         
         return df
     
-    def add_technical_indicators(self, df):
+    def add_technical_indicators(self, df, dropna=True):
         """
         Добавляет технические индикаторы к данным
+        dropna=False оставляет строки разогрева индикаторов с NaN
+        (для моделей, которые умеют работать с пропусками, например hist_gradient_boosting)
         """
         print("📈 Добавляем технические индикаторы...")
         
@@ -229,7 +248,11 @@ class MarketDataProcessor:
         df['target_5d'] = np.where(df['close'].shift(-5) > df['close'], 1, 0)
         
         # Удаляем строки с NaN значениями
-        df = df.dropna()
+        if dropna:
+            df = df.dropna()
+        else:
+            # Деление на ноль в индикаторах (RSI, стохастик) дает inf - считаем это пропуском
+            df = df.replace([np.inf, -np.inf], np.nan)
         
         return df
     
@@ -240,13 +263,7 @@ class MarketDataProcessor:
         print("🔧 Подготавливаем данные для обучения...")
         
         # Выбираем признаки
-        feature_columns = [
-            'open', 'high', 'low', 'close', 'volume',
-            'sma5', 'sma20', 'sma50', 'ema12', 'ema26',
-            'macd', 'macd_signal', 'macd_hist',
-            'rsi', 'bb_middle', 'bb_std', 'bb_upper', 'bb_lower',
-            'stoch_k', 'stoch_d', 'atr', 'momentum', 'pct_change'
-        ]
+        feature_columns = list(self.FEATURE_COLUMNS)
         
         # Создаем массивы признаков и целевых переменных
         X = df[feature_columns].values
@@ -269,14 +286,25 @@ class MarketPredictor:
     Класс для обучения и оценки моделей машинного обучения
     """
     
-    def __init__(self, models_dir='models'):
-        """Инициализация с указанием директории для моделей"""
+    def __init__(self, models_dir='models', report_mode='sync', max_plot_points=2000, n_jobs=None):
+        """
+        Инициализация с указанием директории для моделей
+        report_mode: 'sync', 'background' или 'off' - как строить графики (см. ReportRunner)
+        max_plot_points: максимум точек на ряд в интерактивных графиках (прореживание LTTB)
+        n_jobs: бюджет процессов для перестановочной важности (по умолчанию - все ядра)
+        """
         self.models_dir = models_dir
+        self.reporter = ReportRunner(report_mode)
+        self.max_plot_points = max_plot_points
+        self.importance_engine = PermutationImportance(n_jobs=n_jobs)
         os.makedirs(models_dir, exist_ok=True)
     
-    def train_ml_model(self, X_train, y_train, model_type='random_forest'):
+    def train_ml_model(self, X_train, y_train, model_type='random_forest', n_jobs=None,
+                       validation_fraction=0.2):
         """
         Обучает модель машинного обучения
+        n_jobs: число потоков для обучения (random_forest, hist_gradient_boosting)
+        validation_fraction: доля последних по времени строк для ранней остановки hist_gradient_boosting
         """
         print(f"🧠 Обучаем модель машинного обучения ({model_type})...")
         
@@ -285,10 +313,14 @@ class MarketPredictor:
             model = RandomForestClassifier(
                 n_estimators=100,
                 max_depth=10,
-                random_state=42
+                random_state=42,
+                n_jobs=n_jobs
             )
             model.fit(X_train, y_train)
             
+            # Потоки нужны только для обучения: для предсказаний по одному бару они лишь добавляют накладные расходы
+            model.set_params(n_jobs=None)
+            
         elif model_type == 'gradient_boosting':
             # Настраиваем и обучаем градиентный бустинг
             model = GradientBoostingClassifier(
@@ -299,6 +331,26 @@ class MarketPredictor:
             )
             model.fit(X_train, y_train)
             
+        elif model_type == 'hist_gradient_boosting':
+            # Гистограммный бустинг: многопоточный, сам обрабатывает пропуски (NaN)
+            model = HistGradientBoostingClassifier(
+                max_iter=1000,
+                learning_rate=0.1,
+                max_leaf_nodes=31,
+                early_stopping=True,
+                scoring='loss',
+                n_iter_no_change=20,
+                random_state=42
+            )
+            
+            # Валидационная выборка - последние по времени строки, без перемешивания
+            split = int(len(X_train) * (1 - validation_fraction))
+            with threadpool_limits(limits=n_jobs, user_api='openmp'):
+                model.fit(X_train[:split], y_train[:split],
+                          X_val=X_train[split:], y_val=y_train[split:])
+            
+            print(f"⏹️ Ранняя остановка: {model.n_iter_} итераций")
+            
         else:
             raise ValueError(f"Неизвестный тип модели: {model_type}")
         
@@ -364,6 +416,85 @@ class MarketPredictor:
         
         return model, history
     
+    def update_ml_model(self, model, X_new, y_new, n_new_estimators=10):
+        """
+        Дообучает модель на новых данных, не меняя уже построенные деревья (warm_start):
+        случайному лесу добавляется n_new_estimators деревьев,
+        гистограммному бустингу - n_new_estimators итераций
+        """
+        if not isinstance(model, (RandomForestClassifier, HistGradientBoostingClassifier)):
+            raise ValueError(f"Дообучение не поддерживается для модели {type(model).__name__}")
+        
+        # Новые деревья должны видеть те же классы, что и исходная модель
+        if not np.array_equal(np.unique(y_new), model.classes_):
+            print("⚠️ В новых данных представлены не все классы, дообучение пропущено")
+            return model
+        
+        if isinstance(model, RandomForestClassifier):
+            print(f"🌲 Дообучаем случайный лес: +{n_new_estimators} деревьев на {len(y_new)} барах...")
+            model.set_params(warm_start=True, n_estimators=model.n_estimators + n_new_estimators)
+            model.fit(X_new, y_new)
+            model.set_params(warm_start=False)
+        else:
+            # Ранняя остановка отключена: число новых итераций задано явно
+            print(f"🌲 Дообучаем гистограммный бустинг: +{n_new_estimators} итераций на {len(y_new)} барах...")
+            early_stopping = model.early_stopping
+            model.set_params(warm_start=True, early_stopping=False,
+                             max_iter=model.n_iter_ + n_new_estimators)
+            model.fit(X_new, y_new)
+            model.set_params(warm_start=False, early_stopping=early_stopping)
+        
+        return model
+    
+    def fine_tune_dl_model(self, X_recent, y_recent, epochs=5, batch_size=32,
+                           learning_rate=0.0001, checkpoint_path=None, validation_fraction=0.2):
+        """
+        Дообучает модель глубокого обучения из последнего чекпоинта на недавнем окне данных
+        validation_fraction: доля самых старых строк окна, отводимая под валидацию
+        """
+        checkpoint_path = checkpoint_path or f"{self.models_dir}/dl_model_checkpoint.h5"
+        if not os.path.exists(checkpoint_path):
+            raise FileNotFoundError(f"Чекпоинт не найден: {checkpoint_path}")
+        
+        print(f"🧠 Дообучаем модель глубокого обучения из {checkpoint_path} ({epochs} эпох)...")
+        model = keras.models.load_model(checkpoint_path)
+        
+        # Меньшая скорость обучения, чтобы не разрушить уже выученные веса
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+            loss='binary_crossentropy',
+            metrics=['accuracy']
+        )
+        
+        callbacks = [
+            EarlyStopping(
+                monitor='val_loss',
+                patience=2,
+                restore_best_weights=True,
+                verbose=1
+            ),
+            ModelCheckpoint(
+                filepath=checkpoint_path,
+                monitor='val_loss',
+                save_best_only=True,
+                verbose=1
+            )
+        ]
+        
+        # Валидация - на старых строках окна: validation_split отрезал бы последние строки,
+        # и новые бары, ради которых идет дообучение, не попали бы в обучение
+        split = int(len(X_recent) * validation_fraction)
+        history = model.fit(
+            X_recent[split:], y_recent[split:],
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_data=(X_recent[:split], y_recent[:split]),
+            callbacks=callbacks,
+            verbose=1
+        )
+        
+        return model, history
+    
     def evaluate_model(self, model, X_test, y_test, model_type='ml'):
         """
         Оценивает качество модели
@@ -391,24 +522,32 @@ class MarketPredictor:
         print(f"Полнота (Recall): {recall:.4f}")
         print(f"F1-мера: {f1:.4f}")
         
-        # Строим матрицу ошибок
+        # Строим матрицу ошибок (вне критического пути, согласно режиму отчетности)
         cm = confusion_matrix(y_test, y_pred)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-        plt.title('Матрица ошибок')
-        plt.ylabel('Истинный класс')
-        plt.xlabel('Предсказанный класс')
-        plt.savefig('visualizations/confusion_matrix.png')
+        self.reporter.submit(self.plot_confusion_matrix, cm)
         
         return {
             'accuracy': accuracy,
             'precision': precision,
             'recall': recall,
             'f1': f1,
+            'confusion_matrix': cm,
             'y_pred': y_pred,
             'y_pred_proba': y_pred_proba
         }
     
+    def plot_confusion_matrix(self, cm, path='visualizations/confusion_matrix.png'):
+        """
+        Визуализирует матрицу ошибок
+        """
+        fig = Figure(figsize=(8, 6))
+        ax = fig.subplots()
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax)
+        ax.set_title('Матрица ошибок')
+        ax.set_ylabel('Истинный класс')
+        ax.set_xlabel('Предсказанный класс')
+        fig.savefig(path)
+    
     def save_model(self, model, scaler, feature_columns, model_type='ml', version='v1'):
         """
         Сохраняет модель и связанные с ней данные
@@ -430,6 +569,12 @@ class MarketPredictor:
             # Сохраняем модель машинного обучения
             model_path = f"{self.models_dir}/market_predictor_model_{version}.pkl"
             joblib.dump(model, model_path)
+            
+            # Экспортируем случайный лес в плоские массивы для быстрого скоринга одного бара
+            if isinstance(model, RandomForestClassifier):
+                compiled_path = f"{self.models_dir}/market_predictor_model_{version}_compiled.npz"
+                CompiledForest.from_sklearn(model).save(compiled_path)
+                print(f"✅ Скомпилированный лес сохранен в {compiled_path}")
         
         # Сохраняем скейлер
         scaler_path = f"{self.models_dir}/scaler_{version}.pkl"
@@ -444,63 +589,108 @@ class MarketPredictor:
         
         return model_path
     
-    def plot_feature_importance(self, model, feature_columns):
+    def compute_feature_importance(self, model, feature_columns, X, y, model_type='ml', version='v1'):
+        """
+        Считает перестановочную важность признаков (работает и для DL модели)
+        и сохраняет ее в models/feature_importance_{version}.json для отбора признаков
+        """
+        result = self.importance_engine.compute(model, X, y, model_type)
+        
+        importance_path = f"{self.models_dir}/feature_importance_{version}.json"
+        save_importances(result, feature_columns, importance_path)
+        print(f"✅ Важность признаков сохранена в {importance_path}")
+        
+        return result
+    
+    def plot_feature_importance(self, model, feature_columns, importances=None,
+                                path='feature_importance.png'):
         """
         Визуализирует важность признаков для модели
+        importances: заранее посчитанная важность (см. compute_feature_importance),
+        иначе используется встроенная feature_importances_
         """
-        if not hasattr(model, 'feature_importances_'):
-            print("⚠️ Модель не поддерживает важность признаков")
-            return
+        if importances is None:
+            if not hasattr(model, 'feature_importances_'):
+                print("⚠️ Модель не поддерживает важность признаков")
+                return
+            importances = model.feature_importances_
         
-        # Получаем важность признаков
-        importances = model.feature_importances_
         indices = np.argsort(importances)[::-1]
         
         # Строим график
-        plt.figure(figsize=(12, 8))
-        plt.title('Важность признаков')
-        plt.bar(range(len(importances)), importances[indices])
-        plt.xticks(range(len(importances)), [feature_columns[i] for i in indices], rotation=90)
-        plt.tight_layout()
-        plt.savefig('feature_importance.png')
+        self.reporter.submit(self._render_feature_importance, importances, indices,
+                             feature_columns, path)
         
         return importances, indices
     
+    def _render_feature_importance(self, importances, indices, feature_columns,
+                                   path='feature_importance.png'):
+        """
+        Рисует столбчатую диаграмму важности признаков
+        """
+        fig = Figure(figsize=(12, 8))
+        ax = fig.subplots()
+        ax.set_title('Важность признаков')
+        ax.bar(range(len(importances)), importances[indices])
+        ax.set_xticks(range(len(importances)))
+        ax.set_xticklabels([feature_columns[i] for i in indices], rotation=90)
+        fig.tight_layout()
+        fig.savefig(path)
+    
     def plot_training_history(self, history):
         """
         Визуализирует историю обучения модели глубокого обучения
         """
-        plt.figure(figsize=(12, 5))
+        # Передаем в отчет только словарь метрик, а не объект с ссылкой на модель
+        self.reporter.submit(self._render_training_history, dict(history.history))
+    
+    def _render_training_history(self, history, path='visualizations/dl_training_history.png'):
+        """
+        Рисует графики точности и функции потерь по эпохам
+        """
+        fig = Figure(figsize=(12, 5))
+        ax_acc, ax_loss = fig.subplots(1, 2)
         
         # График точности
-        plt.subplot(1, 2, 1)
-        plt.plot(history.history['accuracy'])
-        plt.plot(history.history['val_accuracy'])
-        plt.title('Точность модели')
-        plt.ylabel('Точность')
-        plt.xlabel('Эпоха')
-        plt.legend(['Обучение', 'Валидация'], loc='lower right')
+        ax_acc.plot(history['accuracy'])
+        ax_acc.plot(history['val_accuracy'])
+        ax_acc.set_title('Точность модели')
+        ax_acc.set_ylabel('Точность')
+        ax_acc.set_xlabel('Эпоха')
+        ax_acc.legend(['Обучение', 'Валидация'], loc='lower right')
         
         # График функции потерь
-        plt.subplot(1, 2, 2)
-        plt.plot(history.history['loss'])
-        plt.plot(history.history['val_loss'])
-        plt.title('Функция потерь')
-        plt.ylabel('Потери')
-        plt.xlabel('Эпоха')
-        plt.legend(['Обучение', 'Валидация'], loc='upper right')
-        
-        plt.tight_layout()
-        plt.savefig('visualizations/dl_training_history.png')
+        ax_loss.plot(history['loss'])
+        ax_loss.plot(history['val_loss'])
+        ax_loss.set_title('Функция потерь')
+        ax_loss.set_ylabel('Потери')
+        ax_loss.set_xlabel('Эпоха')
+        ax_loss.legend(['Обучение', 'Валидация'], loc='upper right')
+        
+        fig.tight_layout()
+        fig.savefig(path)
     
     def plot_predictions(self, df, y_test, y_pred, y_pred_proba):
         """
         Визуализирует предсказания модели
         """
         # Создаем DataFrame для визуализации
-        test_df = df.iloc[-len(y_test):].copy()
+        test_df = df.iloc[-len(y_test):][['timestamp', 'close']].copy()
         test_df['prediction'] = y_pred
-        test_df['probability'] = y_pred_proba
+        test_df['probability'] = np.asarray(y_pred_proba).ravel()
+        
+        self.reporter.submit(self._render_predictions, test_df)
+    
+    def _render_predictions(self, test_df, path='visualizations/final_prediction.html'):
+        """
+        Строит интерактивный график предсказаний с прореживанием длинных рядов
+        """
+        # Прореживаем каждый ряд отдельно (LTTB), чтобы HTML оставался компактным
+        x = test_df['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+        close_idx = lttb_downsample(x, test_df['close'].values, self.max_plot_points)
+        proba_idx = lttb_downsample(x, test_df['probability'].values, self.max_plot_points)
+        close_df = test_df.iloc[close_idx]
+        proba_df = test_df.iloc[proba_idx]
         
         # Создаем интерактивный график с Plotly
         fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
@@ -509,14 +699,14 @@ class MarketPredictor:
         
         # График цены закрытия
         fig.add_trace(
-            go.Scatter(x=test_df['timestamp'], y=test_df['close'], 
+            go.Scatter(x=close_df['timestamp'], y=close_df['close'], 
                       name='Цена закрытия', line=dict(color='blue')),
             row=1, col=1
         )
         
         # График вероятности роста
         fig.add_trace(
-            go.Scatter(x=test_df['timestamp'], y=test_df['probability'], 
+            go.Scatter(x=proba_df['timestamp'], y=proba_df['probability'], 
                       name='Вероятность роста', line=dict(color='green')),
             row=2, col=1
         )
@@ -539,12 +729,14 @@ class MarketPredictor:
             yaxis2=dict(title='Вероятность')
         )
         
-        # Сохраняем график
-        fig.write_html('visualizations/final_prediction.html')
+        # Сохраняем график (plotly.js подключается с CDN, а не встраивается в каждый файл)
+        fig.write_html(path, include_plotlyjs='cdn')
 
-def main():
+def main(report_mode='background', total_cpus=None):
     """
     Основная функция для обучения и оценки моделей
+    report_mode: режим построения графиков ('sync', 'background', 'off')
+    total_cpus: общий бюджет ядер для параллельного обучения (по умолчанию - все ядра)
     """
     print("🚀 Запуск обучения моделей MarketPredictor...")
     
@@ -554,41 +746,180 @@ def main():
     
     # Инициализируем обработчик данных и предиктор
     data_processor = MarketDataProcessor()
-    predictor = MarketPredictor()
+    predictor = MarketPredictor(report_mode=report_mode, n_jobs=total_cpus)
     
     # Загружаем и обрабатываем данные
-    df = data_processor.fetch_market_data(symbol='EURUSD', interval='daily', days=1000)
-    df = data_processor.add_technical_indicators(df)
+    raw_df = data_processor.fetch_market_data(symbol='EURUSD', interval='daily', days=1000)
+    df = data_processor.add_technical_indicators(raw_df)
+    
+    # У последнего бара направление следующего дня еще неизвестно
+    df = df.iloc[:-1]
     
     # Подготавливаем данные для обучения
     X_train, X_test, y_train, y_test, scaler, feature_columns = data_processor.prepare_features_targets(
         df, target_column='target_1d', test_size=0.2
     )
     
-    # Обучаем модель машинного обучения
-    ml_model = predictor.train_ml_model(X_train, y_train, model_type='random_forest')
+    # RF и DL не принимают NaN, а гистограммный бустинг обучаем и на строках разогрева
+    # индикаторов: берем кадр без dropna, тестовый период тот же, скейлер общий (он пропускает NaN)
+    # Границу берем по времени: dropna мог удалить строки и внутри тестового периода
+    full_df = data_processor.add_technical_indicators(raw_df, dropna=False).iloc[:-1]
+    hgb_train_df = full_df[full_df['timestamp'] < df['timestamp'].iloc[-len(y_test)]]
+    X_train_hgb = scaler.transform(hgb_train_df[feature_columns].values)
+    y_train_hgb = hgb_train_df['target_1d'].values
+    
+    # Обучаем модели машинного и глубокого обучения одновременно в рамках бюджета CPU
+    orchestrator = TrainingOrchestrator(total_cpus=total_cpus)
+    orchestrator.add_job(
+        'random_forest',
+        lambda n_threads: predictor.train_ml_model(X_train, y_train, model_type='random_forest',
+                                                   n_jobs=n_threads),
+        kind='sklearn'
+    )
+    orchestrator.add_job(
+        'hist_gradient_boosting',
+        lambda n_threads: predictor.train_ml_model(X_train_hgb, y_train_hgb,
+                                                   model_type='hist_gradient_boosting', n_jobs=n_threads),
+        kind='sklearn'
+    )
+    orchestrator.add_job(
+        'deep_learning',
+        lambda n_threads: predictor.train_dl_model(X_train, y_train, epochs=100, batch_size=32),
+        kind='tensorflow'
+    )
+    trained = orchestrator.run()
+    ml_model = trained['random_forest']
+    hgb_model = trained['hist_gradient_boosting']
+    dl_model, history = trained['deep_learning']
+    
+    # Оцениваем модель машинного обучения
     ml_metrics = predictor.evaluate_model(ml_model, X_test, y_test, model_type='ml')
     predictor.save_model(ml_model, scaler, feature_columns, model_type='ml', version='v1')
     
-    # Визуализируем важность признаков
-    predictor.plot_feature_importance(ml_model, feature_columns)
+    # Оцениваем модель гистограммного бустинга
+    hgb_metrics = predictor.evaluate_model(hgb_model, X_test, y_test, model_type='ml')
+    predictor.save_model(hgb_model, scaler, feature_columns, model_type='ml', version='hgb_v1')
+    
+    # Перестановочная важность признаков на тестовой выборке - сохраняется для отбора признаков
+    ml_importance = predictor.compute_feature_importance(ml_model, feature_columns, X_test, y_test,
+                                                         model_type='ml', version='v1')
+    predictor.plot_feature_importance(ml_model, feature_columns, ml_importance['importances_mean'])
     
-    # Обучаем модель глубокого обучения с улучшенной архитектурой
-    dl_model, history = predictor.train_dl_model(X_train, y_train, epochs=100, batch_size=32)
+    # Оцениваем модель глубокого обучения
     dl_metrics = predictor.evaluate_model(dl_model, X_test, y_test, model_type='dl')
     predictor.save_model(dl_model, scaler, feature_columns, model_type='dl', version='v1')
     
-    # Визуализируем историю обучения
+    # Визуализируем историю обучения и важность признаков DL модели
     predictor.plot_training_history(history)
+    dl_importance = predictor.compute_feature_importance(dl_model, feature_columns, X_test, y_test,
+                                                         model_type='dl', version='dl_v1')
+    predictor.plot_feature_importance(dl_model, feature_columns, dl_importance['importances_mean'],
+                                      path='visualizations/dl_feature_importance.png')
+    
+    # Оцениваем ансамбль всех моделей на общих масштабированных признаках
+    ensemble = EnsemblePredictor(
+        {'random_forest': ml_model, 'hist_gradient_boosting': hgb_model, 'deep_learning': dl_model},
+        scaler, feature_columns
+    )
+    ensemble_result = ensemble.predict_proba(X_test, scaled=True)
+    ensemble.close()
+    ensemble_accuracy = accuracy_score(y_test, (ensemble_result['probability'] > 0.5).astype(int))
     
     # Визуализируем предсказания
     predictor.plot_predictions(df, y_test, dl_metrics['y_pred'], dl_metrics['y_pred_proba'])
     
+    # Запоминаем полное обучение для политики дообучения
+    RetrainPolicy(predictor.models_dir).record_full(
+        df['timestamp'].iloc[-1], len(X_train), ml_metrics['y_pred'] == y_test
+    )
+    
     print("✅ Обучение моделей завершено!")
     print(f"📊 Точность ML модели: {ml_metrics['accuracy']:.4f}")
+    print(f"📊 Точность HGB модели: {hgb_metrics['accuracy']:.4f}")
     print(f"📊 Точность DL модели: {dl_metrics['accuracy']:.4f}")
-    print("📈 Графики сохранены в директории 'visualizations'")
+    print(f"📊 Точность ансамбля: {ensemble_accuracy:.4f}")
+    
+    # Дожидаемся фоновых графиков перед выходом
+    predictor.reporter.close()
+    if report_mode != 'off':
+        print("📈 Графики сохранены в директории 'visualizations'")
     print("💾 Модели сохранены в директории 'models'")
 
+def incremental_main(recent_window=250, n_new_estimators=10, fine_tune_epochs=5,
+                     report_mode='background', total_cpus=None):
+    """
+    Дообучение моделей на новых барах; при необходимости запускает полное обучение
+    recent_window: размер недавнего окна (в барах) для новых деревьев и дообучения DL модели
+    total_cpus: бюджет ядер для полного обучения, если политика его потребует
+    """
+    print("🔁 Запуск дообучения моделей MarketPredictor...")
+    
+    predictor = MarketPredictor(report_mode='off')
+    policy = RetrainPolicy(predictor.models_dir)
+    if policy.state is None:
+        print("🚀 Полное обучение: полного обучения еще не было")
+        return main(report_mode=report_mode, total_cpus=total_cpus)
+    
+    # Загружаем и обрабатываем данные
+    data_processor = MarketDataProcessor()
+    df = data_processor.fetch_market_data(symbol='EURUSD', interval='daily', days=1000)
+    df = data_processor.add_technical_indicators(df)
+    
+    # У последнего бара направление следующего дня еще неизвестно
+    df = df.iloc[:-1]
+    
+    # Загружаем сохраненные модель, скейлер и признаки
+    ml_model = joblib.load(f"{predictor.models_dir}/market_predictor_model_v1.pkl")
+    scaler = joblib.load(f"{predictor.models_dir}/scaler_v1.pkl")
+    with open(f"{predictor.models_dir}/feature_columns_v1.json") as f:
+        feature_columns = json.load(f)
+    
+    # Новые бары и верность предсказаний текущей модели на них
+    new_bars = df[df['timestamp'] > policy.last_timestamp]
+    outcomes = []
+    if len(new_bars) > 0:
+        X_new = scaler.transform(new_bars[feature_columns].values)
+        outcomes = ml_model.predict(X_new) == new_bars['target_1d'].values
+    
+    decision, reason = policy.decide(len(new_bars), outcomes)
+    if decision == RetrainPolicy.FULL:
+        print(f"🚀 Полное обучение: {reason}")
+        return main(report_mode=report_mode, total_cpus=total_cpus)
+    if decision == RetrainPolicy.SKIP:
+        print(f"⏭️ Дообучение не требуется: {reason}")
+        return
+    
+    print(f"🔁 Дообучение: {reason}")
+    recent = df.iloc[-recent_window:]
+    X_recent = scaler.transform(recent[feature_columns].values)
+    y_recent = recent['target_1d'].values
+    
+    ml_model = predictor.update_ml_model(ml_model, X_recent, y_recent, n_new_estimators)
+    predictor.save_model(ml_model, scaler, feature_columns, model_type='ml', version='v1')
+    
+    # Бустинг загружается в ансамбль рядом с лесом - дообучаем и его
+    hgb_path = f"{predictor.models_dir}/market_predictor_model_hgb_v1.pkl"
+    if os.path.exists(hgb_path):
+        hgb_model = predictor.update_ml_model(joblib.load(hgb_path), X_recent, y_recent, n_new_estimators)
+        predictor.save_model(hgb_model, scaler, feature_columns, model_type='ml', version='hgb_v1')
+    
+    dl_model, _ = predictor.fine_tune_dl_model(X_recent, y_recent, epochs=fine_tune_epochs)
+    predictor.save_model(dl_model, scaler, feature_columns, model_type='dl', version='v1')
+    
+    policy.record_incremental(df['timestamp'].iloc[-1], len(new_bars), outcomes)
+    print("✅ Дообучение моделей завершено!")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Обучение моделей MarketPredictor')
+    parser.add_argument('--incremental', action='store_true',
+                        help='дообучить модели на новых барах вместо полного обучения')
+    parser.add_argument('--report-mode', choices=ReportRunner.MODES, default='background',
+                        help='режим построения графиков')
+    parser.add_argument('--cpus', type=int, default=None,
+                        help='общий бюджет ядер CPU для обучения (по умолчанию - все ядра)')
+    args = parser.parse_args()
+    
+    if args.incremental:
+        incremental_main(report_mode=args.report_mode, total_cpus=args.cpus)
+    else:
+        main(report_mode=args.report_mode, total_cpus=args.cpus)
\ No newline at end of file
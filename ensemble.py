@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Ансамбль моделей MarketPredictor: случайный лес, гистограммный бустинг и DL модель
+Признаки вычисляются и масштабируются один раз, модели работают параллельно
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import joblib
+import numpy as np
+
+from compiled_forest import CompiledForest, RoutedForest
+
+
+class EnsemblePredictor:
+    """
+    Параллельный ансамбль моделей с общими признаками и общим бюджетом задержки
+
+    Модели sklearn выполняются в общем пуле потоков (обход деревьев в sklearn
+    отпускает GIL), Keras-модель - в собственном выделенном потоке: TensorFlow
+    отпускает GIL на время вычислений. Вероятности объединяются взвешенным средним.
+
+    Модель, не уложившаяся в бюджет, продолжает считать в фоне; пока она занята,
+    новые запросы ей не отправляются (она попадает в missing), чтобы очередь
+    к опоздавшей модели не увеличивала задержку следующих сигналов.
+    """
+
+    def __init__(self, models, scaler, feature_columns, weights=None, latency_budget=None):
+        """
+        models: словарь {имя: модель}; модели без predict_proba считаются Keras-моделями
+        weights: словарь {имя: вес}, по умолчанию вес модели равен 1
+        latency_budget: максимальное время ожидания моделей в секундах (None - без ограничения)
+        """
+        self.models = models
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+        self.weights = {name: (weights or {}).get(name, 1.0) for name in models}
+        self.latency_budget = latency_budget
+        self.model_types = {name: 'ml' if hasattr(model, 'predict_proba') else 'dl'
+                            for name, model in models.items()}
+
+        n_ml = sum(1 for kind in self.model_types.values() if kind == 'ml')
+        self._ml_executor = ThreadPoolExecutor(max_workers=max(n_ml, 1), thread_name_prefix='ensemble-ml')
+        self._dl_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ensemble-keras')
+        self._pending = {}
+
+    @classmethod
+    def from_directory(cls, models_dir='models', version='v1', weights=None, latency_budget=None):
+        """
+        Загружает сохраненные модели, скейлер и признаки из директории моделей
+        Если есть скомпилированный лес, небольшие пакеты считаются им, крупные - sklearn
+        """
+        scaler = joblib.load(f"{models_dir}/scaler_{version}.pkl")
+        with open(f"{models_dir}/feature_columns_{version}.json") as f:
+            feature_columns = json.load(f)
+
+        models = {}
+        forest = joblib.load(f"{models_dir}/market_predictor_model_{version}.pkl")
+        compiled_path = f"{models_dir}/market_predictor_model_{version}_compiled.npz"
+        if os.path.exists(compiled_path):
+            forest = RoutedForest(CompiledForest.load(compiled_path), forest)
+        models['random_forest'] = forest
+
+        hgb_path = f"{models_dir}/market_predictor_model_hgb_{version}.pkl"
+        if os.path.exists(hgb_path):
+            models['hist_gradient_boosting'] = joblib.load(hgb_path)
+
+        for extension in ('keras', 'h5'):
+            dl_path = f"{models_dir}/dl_model_{version}.{extension}"
+            if os.path.exists(dl_path):
+                # TensorFlow загружаем только при наличии DL модели
+                from tensorflow import keras
+                models['deep_learning'] = keras.models.load_model(dl_path)
+                break
+
+        print(f"🧩 Ансамбль загружен: {', '.join(models)}")
+        return cls(models, scaler, feature_columns, weights, latency_budget)
+
+    def scale(self, X):
+        """
+        Масштабирует признаки один раз для всех моделей
+        То же, что StandardScaler.transform, но без проверки входа на каждом вызове
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return (X - self.scaler.mean_) / self.scaler.scale_
+
+    def _predict_one(self, name, X):
+        """Вероятность роста от одной модели и время ее работы"""
+        start = time.perf_counter()
+        model = self.models[name]
+        if self.model_types[name] == 'dl':
+            # Прямой вызов модели быстрее model.predict на малых пакетах
+            proba = np.asarray(model(X.astype(np.float32), training=False)).ravel()
+        else:
+            proba = model.predict_proba(X)[:, 1]
+        return proba, time.perf_counter() - start
+
+    def predict_proba(self, X, scaled=False):
+        """
+        Взвешенная вероятность роста по всем моделям, уложившимся в бюджет задержки
+        Возвращает словарь с общей вероятностью, вероятностями и задержками моделей,
+        списком моделей, не давших результат (missing), и занятых прошлым запросом (busy)
+        """
+        start = time.perf_counter()
+        X = X if scaled else self.scale(X)
+
+        # Моделям, еще занятым опоздавшим прошлым запросом, новый запрос не отправляем
+        busy = [name for name, future in self._pending.items() if not future.done()]
+        futures = {}
+        for name, kind in self.model_types.items():
+            if name in busy:
+                continue
+            executor = self._dl_executor if kind == 'dl' else self._ml_executor
+            futures[name] = executor.submit(self._predict_one, name, X)
+        self._pending.update(futures)
+
+        # Опоздавшие модели продолжают работу в фоне, но в результат не попадают
+        done, _ = wait(futures.values(), timeout=self.latency_budget)
+        finished = {name: future.result() for name, future in futures.items() if future in done}
+        missing = [name for name in self.model_types if name not in finished]
+        if not finished:
+            raise TimeoutError(f"Ни одна модель не уложилась в {self.latency_budget} с")
+
+        total_weight = sum(self.weights[name] for name in finished)
+        probability = sum(self.weights[name] * proba for name, (proba, _) in finished.items()) / total_weight
+
+        return {
+            'probability': probability,
+            'models': {name: proba for name, (proba, _) in finished.items()},
+            'latency': {name: elapsed for name, (_, elapsed) in finished.items()},
+            'total_latency': time.perf_counter() - start,
+            'missing': missing,
+            'busy': busy
+        }
+
+    def predict(self, X, scaled=False, threshold=0.5):
+        """Предсказанное направление (1 - рост, 0 - падение)"""
+        return (self.predict_proba(X, scaled)['probability'] > threshold).astype(int)
+
+    def predict_from_frame(self, df, processor, n_last=1):
+        """
+        Считает индикаторы по сырым барам и предсказывает для последних n_last баров
+        processor: MarketDataProcessor, которым считались признаки при обучении
+        """
+        features = processor.add_technical_indicators(df)[self.feature_columns]
+        return self.predict_proba(features.values[-n_last:])
+
+    def close(self):
+        """Останавливает рабочие потоки"""
+        self._ml_executor.shutdown(wait=True)
+        self._dl_executor.shutdown(wait=True)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Перестановочная важность признаков для моделей MarketPredictor (RandomForest и Keras)
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def accuracy_from_proba(y_true, y_proba):
+    """Точность при пороге 0.5 - та же метрика, что и в evaluate_model"""
+    return np.mean((y_proba > 0.5).astype(int) == y_true)
+
+
+def predict_proba_positive(model, X, model_type='ml'):
+    """
+    Возвращает вероятность класса 1 для моделей ML (sklearn) и DL (Keras)
+    """
+    if model_type == 'dl':
+        return np.asarray(model.predict(X, batch_size=4096, verbose=0)).ravel()
+    return model.predict_proba(X)[:, 1]
+
+
+def _permute_feature(model, X, y, feature, seed, n_repeats, scoring, model_type, max_batch_rows):
+    """
+    Считает оценки модели для n_repeats перестановок одного признака
+    Перемешанные копии склеиваются в один пакет, чтобы сделать минимум вызовов predict
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = X.shape[0]
+    repeats_per_batch = max(1, max_batch_rows // max(n_rows, 1))
+
+    scores = []
+    for start in range(0, n_repeats, repeats_per_batch):
+        count = min(repeats_per_batch, n_repeats - start)
+        batch = np.tile(X, (count, 1))
+        for r in range(count):
+            batch[r * n_rows:(r + 1) * n_rows, feature] = rng.permutation(X[:, feature])
+
+        proba = predict_proba_positive(model, batch, model_type)
+        for r in range(count):
+            scores.append(scoring(y, proba[r * n_rows:(r + 1) * n_rows]))
+
+    return np.array(scores)
+
+
+# Состояние рабочего процесса: модель и данные передаются один раз при старте процесса
+_worker_state = {}
+
+
+def _init_worker(model, X, y, n_repeats, scoring, model_type, max_batch_rows):
+    """Инициализация рабочего процесса пула"""
+    _worker_state.update(
+        model=model, X=X, y=y, n_repeats=n_repeats, scoring=scoring,
+        model_type=model_type, max_batch_rows=max_batch_rows
+    )
+
+
+def _worker_task(feature, seed):
+    """Задача рабочего процесса: перестановки одного признака"""
+    return feature, _permute_feature(feature=feature, seed=seed, **_worker_state)
+
+
+class PermutationImportance:
+    """
+    Модельно-независимая перестановочная важность признаков
+
+    - перемешанные копии признака отправляются в модель одним пакетом
+    - признаки ML-моделей обрабатываются параллельно в пуле процессов
+    - базовые предсказания считаются один раз за вызов compute и общие для всех признаков
+
+    Пул процессов запускается через forkserver, а не fork: к моменту расчета в процессе
+    уже работают потоки TensorFlow и фоновой отрисовки графиков, и fork может зависнуть.
+    Модель, данные и scoring передаются рабочим процессам через pickle.
+
+    Keras-модели считаются в текущем процессе: TensorFlow нельзя безопасно
+    копировать в дочерние процессы, а predict на больших пакетах сам распараллеливается
+    на пул потоков TensorFlow (в main() ограниченный долей ядер, выделенной при обучении).
+    """
+
+    def __init__(self, n_repeats=5, n_jobs=None, random_state=42, scoring=None,
+                 max_batch_rows=200_000):
+        """
+        n_repeats: число перестановок каждого признака
+        n_jobs: число процессов для ML-моделей (None - все ядра, 1 - без пула)
+        scoring: функция score(y_true, y_proba), по умолчанию точность;
+                 должна сериализоваться pickle (функция модуля, а не lambda)
+        max_batch_rows: максимальный размер пакета для одного вызова predict
+        """
+        self.n_repeats = n_repeats
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.random_state = random_state
+        self.scoring = scoring or accuracy_from_proba
+        self.max_batch_rows = max_batch_rows
+
+    def compute(self, model, X, y, model_type='ml'):
+        """
+        Считает падение метрики при перестановке каждого признака
+        Возвращает словарь со средними, стандартными отклонениями и базовой оценкой
+        """
+        X = np.asarray(X)
+        y = np.asarray(y).ravel()
+        n_features = X.shape[1]
+        print(f"🔀 Считаем перестановочную важность {n_features} признаков ({model_type})...")
+
+        # Базовая оценка считается один раз; кэш между вызовами не ведется,
+        # так как модель могла быть переобучена на месте
+        baseline_score = self.scoring(y, predict_proba_positive(model, X, model_type))
+
+        # Независимые генераторы для каждого признака - результат не зависит от порядка выполнения
+        seeds = np.random.SeedSequence(self.random_state).generate_state(n_features)
+
+        scores = np.empty((n_features, self.n_repeats))
+        if model_type == 'dl' or self.n_jobs == 1:
+            for feature in range(n_features):
+                scores[feature] = _permute_feature(
+                    model, X, y, feature, seeds[feature], self.n_repeats,
+                    self.scoring, model_type, self.max_batch_rows
+                )
+        else:
+            init_args = (model, X, y, self.n_repeats, self.scoring, model_type, self.max_batch_rows)
+            with ProcessPoolExecutor(max_workers=min(self.n_jobs, n_features),
+                                     mp_context=multiprocessing.get_context('forkserver'),
+                                     initializer=_init_worker, initargs=init_args) as pool:
+                futures = [pool.submit(_worker_task, feature, seeds[feature])
+                           for feature in range(n_features)]
+                for future in futures:
+                    feature, feature_scores = future.result()
+                    scores[feature] = feature_scores
+
+        drops = baseline_score - scores
+        return {
+            'importances_mean': drops.mean(axis=1),
+            'importances_std': drops.std(axis=1),
+            'importances': drops,
+            'baseline_score': baseline_score
+        }
+
+
+def save_importances(result, feature_columns, path):
+    """
+    Сохраняет importances_mean и importances_std каждого признака в JSON
+    """
+    data = {
+        'baseline_score': float(result['baseline_score']),
+        'features': {
+            column: {'importances_mean': float(mean), 'importances_std': float(std)}
+            for column, mean, std in zip(feature_columns, result['importances_mean'],
+                                         result['importances_std'])
+        }
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def load_importances(path):
+    """
+    Загружает сохраненную важность: словарь {признак: {'importances_mean', 'importances_std'}}
+    """
+    with open(path) as f:
+        return json.load(f)['features']
+
+
+def select_features(importances, feature_columns, min_importance=0.0):
+    """
+    Возвращает признаки, важность которых больше порога (для сокращения feature_columns)
+    importances: средние важности в порядке feature_columns или словарь из load_importances
+    """
+    if isinstance(importances, dict):
+        importances = [importances[column]['importances_mean'] for column in feature_columns]
+    return [column for column, importance in zip(feature_columns, importances)
+            if importance > min_importance]
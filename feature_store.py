@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Хранилище признаков MarketPredictor в разделяемой памяти
+Один процесс публикует последние матрицы индикаторов по символам, остальные процессы
+(обучение, бэктест, веб-предиктор) подключаются к ним без копирования как к массивам NumPy
+"""
+
+import json
+import os
+import secrets
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Заголовок сегмента: magic, seq, version, n_rows, n_cols, data_capacity, meta_len, retired, generation
+HEADER_FORMAT = '<8sQQQQQQQQ'
+HEADER_SIZE = 128
+MAGIC = b'MPFEAT02'
+EMPTY_MAGIC = b'\0' * 8
+META_CAPACITY = 4096
+DATA_OFFSET = HEADER_SIZE + META_CAPACITY
+
+# Смещения отдельных полей заголовка
+SEQ_OFFSET = 8
+VERSION_OFFSET = 16
+RETIRED_OFFSET = 56
+GENERATION_OFFSET = 64
+
+# Каталог POSIX-сегментов: по номеру inode читатель узнает, что имя указывает на новый сегмент
+SHM_DIR = '/dev/shm'
+
+
+def segment_name(symbol, prefix='mp_features'):
+    """Имя сегмента разделяемой памяти для символа"""
+    return f"{prefix}_{symbol}"
+
+
+def _segment_inode(name):
+    """
+    Номер inode сегмента с данным именем (None, если каталог сегментов недоступен)
+    Отсутствующий сегмент вызывает FileNotFoundError
+    """
+    if not os.path.isdir(SHM_DIR):
+        return None
+    return os.stat(os.path.join(SHM_DIR, name)).st_ino
+
+
+def _attach(name):
+    """
+    Подключается к существующему сегменту, не передавая его resource_tracker:
+    иначе сегмент будет удален при завершении процесса-читателя
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 не поддерживает track - временно отключаем регистрацию.
+        # Отмена регистрации после подключения не подходит: у процессов, порожденных
+        # через fork, и у публикатора в том же процессе общий resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class FeaturePublisher:
+    """
+    Публикует матрицу признаков одного символа в именованный сегмент разделяемой памяти
+
+    Запись защищена счетчиком seq в стиле seqlock: перед записью он становится
+    нечетным, после записи - четным. Процесс-публикатор владеет сегментом и должен
+    жить, пока сегмент нужен читателям.
+
+    Каждый публикатор записывает в заголовок случайное поколение (generation),
+    а версии растут и между перезапусками публикатора (они не меньше текущего
+    времени в микросекундах), поэтому читатели замечают перезапуск.
+    """
+
+    def __init__(self, symbol, capacity_rows=None, prefix='mp_features'):
+        """
+        capacity_rows: начальная емкость в строках (по умолчанию - по первой публикации с запасом)
+        """
+        self.symbol = symbol
+        self.name = segment_name(symbol, prefix)
+        self.capacity_rows = capacity_rows
+        self.shm = None
+        self.version = 0
+        self.generation = secrets.randbits(64)
+
+    def _retire_stale(self):
+        """
+        Помечает устаревшим и удаляет сегмент, оставшийся от завершившегося публикатора
+        Версии продолжают нумерацию старого сегмента
+        """
+        stale = shared_memory.SharedMemory(name=self.name)
+        try:
+            if bytes(stale.buf[:len(MAGIC)]) == MAGIC:
+                stale_version = struct.unpack_from('<Q', stale.buf, VERSION_OFFSET)[0]
+                self.version = max(self.version, stale_version)
+                # Подключенные к нему читатели переподключатся к новому сегменту
+                struct.pack_into('<Q', stale.buf, RETIRED_OFFSET, 1)
+        finally:
+            stale.close()
+            stale.unlink()
+
+    def _allocate(self, data_bytes):
+        """Создает сегмент (старый помечается устаревшим и удаляется)"""
+        if self.shm is not None:
+            # Читатели увидят флаг и переподключатся к новому сегменту с тем же именем
+            struct.pack_into('<Q', self.shm.buf, RETIRED_OFFSET, 1)
+            self.shm.close()
+            self.shm.unlink()
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True,
+                                                  size=DATA_OFFSET + data_bytes)
+        except FileExistsError:
+            # Сегмент остался от завершившегося публикатора - пересоздаем
+            self._retire_stale()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True,
+                                                  size=DATA_OFFSET + data_bytes)
+
+        # Новый сегмент пуст: нечетный seq заставит читателей дождаться первой публикации
+        struct.pack_into(HEADER_FORMAT, self.shm.buf, 0, MAGIC, 1, self.version, 0, 0,
+                         data_bytes, 0, 0, self.generation)
+
+    def publish(self, data, columns, meta=None):
+        """
+        Публикует новую версию матрицы признаков
+        data: двумерный массив (строки - бары, столбцы - признаки)
+        meta: дополнительные сведения для читателей (например, время последнего бара)
+        """
+        data = np.ascontiguousarray(data)
+        if data.ndim != 2 or data.shape[1] != len(columns):
+            raise ValueError("Форма данных не совпадает со списком признаков")
+
+        header = json.dumps({'columns': list(columns), 'dtype': data.dtype.str,
+                             'meta': meta or {}}).encode('utf-8')
+        if len(header) > META_CAPACITY:
+            raise ValueError(f"Описание признаков превышает {META_CAPACITY} байт")
+
+        if self.shm is None or data.nbytes > self.shm.size - DATA_OFFSET:
+            rows = max(data.shape[0], self.capacity_rows or 0)
+            self.capacity_rows = rows * 2
+            self._allocate(self.capacity_rows * data.shape[1] * data.itemsize)
+
+        buf = self.shm.buf
+        seq = struct.unpack_from('<Q', buf, SEQ_OFFSET)[0]
+
+        # Начало записи: нечетный seq (у только что созданного сегмента он уже нечетный)
+        seq = seq if seq % 2 else seq + 1
+        struct.pack_into('<Q', buf, SEQ_OFFSET, seq)
+
+        buf[HEADER_SIZE:HEADER_SIZE + len(header)] = header
+        target = np.ndarray(data.shape, dtype=data.dtype, buffer=buf, offset=DATA_OFFSET)
+        target[...] = data
+        del target
+
+        # Версия растет и после перезапуска публикатора, даже если старый сегмент уже удален
+        self.version = max(self.version + 1, time.time_ns() // 1000)
+        struct.pack_into('<QQQQQ', buf, SEQ_OFFSET + 8, self.version, data.shape[0],
+                         data.shape[1], self.shm.size - DATA_OFFSET, len(header))
+
+        # Конец записи: четный seq
+        struct.pack_into('<Q', buf, SEQ_OFFSET, seq + 1)
+
+        return self.version
+
+    def close(self, unlink=True):
+        """Закрывает сегмент (и по умолчанию удаляет его)"""
+        if self.shm is None:
+            return
+        struct.pack_into('<Q', self.shm.buf, RETIRED_OFFSET, 1)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+
+class FeatureReader:
+    """
+    Читает матрицу признаков символа из разделяемой памяти
+
+    read() возвращает согласованную копию; view() - представление без копирования,
+    которое после использования нужно проверить через is_valid(seq).
+
+    Флаг retired выставляет только живой публикатор. Сегмент публикатора, завершившегося
+    без close(), удаляется без флага, поэтому перед каждым снимком читатель также
+    сверяет inode сегмента с данным именем и поколение публикатора в заголовке.
+    """
+
+    def __init__(self, symbol, prefix='mp_features', max_retries=1000):
+        """Подключение к сегменту символа (сегмент должен быть уже опубликован)"""
+        self.name = segment_name(symbol, prefix)
+        self.max_retries = max_retries
+        self.shm = None
+        self._connect()
+
+    def _connect(self):
+        """
+        Подключается к сегменту и запоминает его inode и поколение
+        Если имя успели переназначить во время подключения, подключается заново
+        """
+        while True:
+            inode = _segment_inode(self.name)
+            shm = _attach(self.name)
+            try:
+                if _segment_inode(self.name) == inode:
+                    break
+            except FileNotFoundError:
+                shm.close()
+                raise
+            shm.close()
+        self.shm = shm
+        self.inode = inode
+        self.generation = None
+
+    def _header(self):
+        """Читает заголовок сегмента"""
+        (magic, seq, version, n_rows, n_cols, _, meta_len, retired,
+         generation) = struct.unpack_from(HEADER_FORMAT, self.shm.buf, 0)
+        if magic == EMPTY_MAGIC:
+            # Сегмент только что создан публикатором, заголовок еще не записан:
+            # считаем, что идет запись (нечетный seq), и читатель повторит попытку
+            return 1, 0, 0, 0, 0, 0
+        if magic != MAGIC:
+            raise ValueError(f"Сегмент {self.name} не является хранилищем признаков")
+
+        # Поколение запоминаем по первому заголовку; смена поколения - другой публикатор
+        if self.generation is None:
+            self.generation = generation
+        return seq, version, n_rows, n_cols, meta_len, retired or generation != self.generation
+
+    def _replaced(self):
+        """Проверяет, что имя сегмента указывает на другой сегмент или удалено"""
+        if self.inode is None:
+            return False
+        try:
+            return _segment_inode(self.name) != self.inode
+        except FileNotFoundError:
+            return True
+
+    def _reattach(self):
+        """Переподключается к пересозданному публикатором сегменту"""
+        try:
+            self.shm.close()
+        except BufferError:
+            # Остались представления на старый сегмент - память освободится вместе с ними
+            pass
+
+        # Между удалением старого и созданием нового сегмента имя ненадолго отсутствует
+        for _ in range(self.max_retries):
+            try:
+                self._connect()
+                return
+            except FileNotFoundError:
+                time.sleep(0.001)
+        raise FileNotFoundError(f"Сегмент {self.name} не найден")
+
+    def _snapshot(self):
+        """
+        Возвращает (seq, version, представление, описание) для четного seq
+        """
+        for attempt in range(self.max_retries):
+            if self._replaced():
+                self._reattach()
+                continue
+            seq, version, n_rows, n_cols, meta_len, retired = self._header()
+            if retired:
+                self._reattach()
+                continue
+            if seq % 2:
+                # Идет запись - уступаем процессор публикатору
+                time.sleep(0 if attempt < 100 else 0.001)
+                continue
+
+            # Описание читаем копией и проверяем, что запись не началась во время чтения
+            raw = bytes(self.shm.buf[HEADER_SIZE:HEADER_SIZE + meta_len])
+            if not self.is_valid(seq):
+                continue
+
+            info = json.loads(raw.decode('utf-8'))
+            array = np.ndarray((n_rows, n_cols), dtype=np.dtype(info['dtype']),
+                               buffer=self.shm.buf, offset=DATA_OFFSET)
+            array.flags.writeable = False
+            return seq, version, array, info
+
+        raise TimeoutError(f"Не удалось получить согласованный снимок {self.name}")
+
+    def is_valid(self, seq):
+        """Проверяет, что данные не менялись с момента снимка seq"""
+        current, _, _, _, _, retired = self._header()
+        return current == seq and not retired
+
+    def view(self):
+        """
+        Представление без копирования: (массив, столбцы, версия, seq)
+        После вычислений на массиве проверьте is_valid(seq) и при необходимости повторите
+        """
+        seq, version, array, info = self._snapshot()
+        return array, info['columns'], version, seq
+
+    def read(self):
+        """
+        Согласованная копия: (массив, столбцы, версия, meta)
+        """
+        for _ in range(self.max_retries):
+            seq, version, array, info = self._snapshot()
+            data = array.copy()
+            if self.is_valid(seq):
+                return data, info['columns'], version, info['meta']
+        raise TimeoutError(f"Не удалось прочитать согласованную версию {self.name}")
+
+    def close(self):
+        """Отключается от сегмента (сегмент не удаляется)"""
+        self.shm.close()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Стадия отчетности MarketPredictor - построение графиков вне критического пути обучения
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def lttb_downsample(x, y, max_points):
+    """
+    Прореживает ряд алгоритмом Largest-Triangle-Three-Buckets (LTTB)
+    Возвращает индексы сохраняемых точек (первая и последняя точки сохраняются всегда)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    # Границы корзин для всех точек, кроме первой и последней
+    bucket_edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    selected = 0
+    for i in range(max_points - 2):
+        start, end = bucket_edges[i], bucket_edges[i + 1]
+
+        # Средняя точка следующей корзины (для последней корзины - последняя точка ряда)
+        if i + 2 < len(bucket_edges):
+            next_start, next_end = bucket_edges[i + 1], bucket_edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Выбираем точку, образующую треугольник наибольшей площади
+        ax, ay = x[selected], y[selected]
+        areas = np.abs(
+            (ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay)
+        )
+        selected = start + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        indices[i + 1] = selected
+
+    return indices
+
+
+class ReportRunner:
+    """
+    Выполняет задачи построения графиков синхронно, в фоновом потоке или отключает их
+
+    Режимы:
+        'sync'       - графики строятся сразу (прежнее поведение)
+        'background' - графики строятся в отдельном рабочем потоке
+        'off'        - графики не строятся
+    """
+
+    MODES = ('sync', 'background', 'off')
+
+    def __init__(self, mode='sync'):
+        """Инициализация с указанием режима отчетности"""
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим отчетности: {mode}")
+        self.mode = mode
+        self._executor = None
+        self._futures = []
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Ставит задачу построения графика в очередь согласно режиму
+        """
+        if self.mode == 'off':
+            return None
+
+        if self.mode == 'sync':
+            return func(*args, **kwargs)
+
+        # Один рабочий поток: рендеринг matplotlib/plotly выполняется последовательно
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report')
+        future = self._executor.submit(func, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """
+        Дожидается завершения всех фоновых задач и сообщает об ошибках
+        """
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠️ Ошибка при построении графика: {e}")
+        self._futures = []
+
+    def close(self):
+        """Дожидается фоновых задач и останавливает рабочий поток"""
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
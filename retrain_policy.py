@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Политика переобучения MarketPredictor - когда нужно полное обучение, а когда достаточно дообучения
+"""
+
+import json
+import os
+from datetime import datetime
+
+
+class RetrainPolicy:
+    """
+    Решает, нужно ли полное переобучение, дообучение или можно ничего не делать
+
+    Состояние (время последнего полного обучения, число дообучений, новые бары,
+    базовая точность и скользящее окно верных/неверных предсказаний) хранится
+    в JSON-файле рядом с моделями.
+
+    Окно точности при полном обучении заполняется последними барами отложенной
+    тестовой выборки, а затем сдвигается новыми барами. Поэтому проверка падения
+    точности работает уже после первых дообучений, а не только после накопления
+    десятков новых баров (до которого раньше срабатывают ограничения по дням и числу дообучений).
+    """
+
+    FULL = 'full'
+    INCREMENTAL = 'incremental'
+    SKIP = 'skip'
+
+    def __init__(self, models_dir='models', min_new_bars=1, max_incremental_updates=10,
+                 max_new_fraction=0.2, max_days_between_full=30, max_accuracy_drop=0.05,
+                 accuracy_window=50):
+        """
+        min_new_bars: минимум новых баров для дообучения
+        max_incremental_updates: максимум дообучений подряд без полного обучения
+        max_new_fraction: доля новых баров (от обучающей выборки), после которой нужно полное обучение
+        max_days_between_full: максимум дней между полными обучениями
+        max_accuracy_drop: допустимое падение точности относительно последнего полного обучения
+        accuracy_window: число последних вне выборки обучения баров для оценки текущей точности
+        """
+        self.state_path = os.path.join(models_dir, 'retrain_state.json')
+        self.min_new_bars = min_new_bars
+        self.max_incremental_updates = max_incremental_updates
+        self.max_new_fraction = max_new_fraction
+        self.max_days_between_full = max_days_between_full
+        self.max_accuracy_drop = max_accuracy_drop
+        self.accuracy_window = accuracy_window
+        self.state = self._load_state()
+
+    def _load_state(self):
+        """Загружает состояние из файла (None, если полного обучения еще не было)"""
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self):
+        """Сохраняет состояние в файл"""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+
+    @property
+    def last_timestamp(self):
+        """Время последнего бара, на котором обучались модели"""
+        if self.state is None:
+            return None
+        return datetime.fromisoformat(self.state['last_timestamp'])
+
+    def _window(self, outcomes):
+        """Окно точности, сдвинутое новыми исходами (1 - верное предсказание, 0 - неверное)"""
+        window = self.state.get('recent_outcomes', []) + [int(o) for o in outcomes]
+        return window[-self.accuracy_window:]
+
+    def decide(self, n_new_bars, outcomes=None, now=None):
+        """
+        Возвращает решение ('full', 'incremental' или 'skip') и причину
+        outcomes: верность предсказаний текущей модели на новых барах (если известна)
+        """
+        now = now or datetime.now()
+
+        if self.state is None:
+            return self.FULL, 'полного обучения еще не было'
+
+        last_full = datetime.fromisoformat(self.state['last_full_retrain'])
+        if (now - last_full).days >= self.max_days_between_full:
+            return self.FULL, f'с последнего полного обучения прошло {(now - last_full).days} дн.'
+
+        if self.state['incremental_updates'] >= self.max_incremental_updates:
+            return self.FULL, f"выполнено {self.state['incremental_updates']} дообучений подряд"
+
+        new_fraction = (self.state['bars_since_full'] + n_new_bars) / max(self.state['train_bars'], 1)
+        if new_fraction >= self.max_new_fraction:
+            return self.FULL, f'новые бары составляют {new_fraction:.0%} обучающей выборки'
+
+        # Точность считаем по скользящему окну: по одному-двум новым барам
+        # она равна 0 или 1 и ничего не говорит о деградации модели
+        baseline = self.state.get('baseline_accuracy')
+        if outcomes is not None and baseline is not None:
+            window = self._window(outcomes)
+            if len(window) >= self.accuracy_window:
+                recent_accuracy = sum(window) / len(window)
+                if baseline - recent_accuracy > self.max_accuracy_drop:
+                    return self.FULL, (f'точность упала с {baseline:.4f} до {recent_accuracy:.4f} '
+                                       f'на последних {len(window)} барах')
+
+        if n_new_bars < self.min_new_bars:
+            return self.SKIP, f'новых баров: {n_new_bars}'
+
+        return self.INCREMENTAL, f'новых баров: {n_new_bars}'
+
+    def record_full(self, last_timestamp, train_bars, outcomes=None, now=None):
+        """
+        Запоминает полное обучение
+        outcomes: верность предсказаний модели на отложенной тестовой выборке (по порядку баров)
+        """
+        outcomes = None if outcomes is None else [int(o) for o in outcomes]
+        self.state = {
+            'last_full_retrain': (now or datetime.now()).isoformat(),
+            'last_timestamp': last_timestamp.isoformat(),
+            'train_bars': int(train_bars),
+            'bars_since_full': 0,
+            'incremental_updates': 0,
+            'baseline_accuracy': sum(outcomes) / len(outcomes) if outcomes else None,
+            'recent_outcomes': (outcomes or [])[-self.accuracy_window:]
+        }
+        self._save_state()
+
+    def record_incremental(self, last_timestamp, n_new_bars, outcomes=None):
+        """
+        Запоминает дообучение на новых барах
+        outcomes: верность предсказаний модели на этих барах (до дообучения)
+        """
+        self.state['last_timestamp'] = last_timestamp.isoformat()
+        self.state['bars_since_full'] += int(n_new_bars)
+        self.state['incremental_updates'] += 1
+        if outcomes is not None:
+            self.state['recent_outcomes'] = self._window(outcomes)
+        self._save_state()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Параллельное обучение моделей MarketPredictor в рамках общего бюджета ядер CPU
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def partition_cpus(weights, total_cpus=None):
+    """
+    Делит ядра между задачами пропорционально весам (метод наибольших остатков)
+    Каждая задача получает хотя бы одно ядро; если задач больше, чем ядер,
+    им приходится делить ядра, о чем выводится предупреждение
+    """
+    total_cpus = total_cpus or os.cpu_count() or 1
+    names = list(weights)
+
+    if total_cpus < len(names):
+        print(f"⚠️ Задач ({len(names)}) больше, чем ядер в бюджете ({total_cpus}): "
+              "задачи будут делить ядра")
+        return {name: 1 for name in names}
+
+    # Каждой задаче - одно ядро, остальные делим пропорционально весам
+    spare = total_cpus - len(names)
+    total_weight = sum(weights.values())
+    shares = {name: weights[name] / total_weight * spare for name in names}
+    allocation = {name: 1 + int(shares[name]) for name in names}
+
+    # Раздаем оставшиеся ядра задачам с наибольшей дробной частью
+    remaining = total_cpus - sum(allocation.values())
+    for name in sorted(names, key=lambda n: shares[n] - int(shares[n]), reverse=True):
+        if remaining <= 0:
+            break
+        allocation[name] += 1
+        remaining -= 1
+
+    return allocation
+
+
+def configure_tf_threads(n_threads):
+    """
+    Ограничивает пулы потоков TensorFlow: intra-op и inter-op вместе укладываются в n_threads
+    (при n_threads=1 минимум - по одному потоку каждого вида)
+    Работает только до первой операции TensorFlow в процессе
+    """
+    import tensorflow as tf
+
+    inter_op = 2 if n_threads >= 4 else 1
+    intra_op = max(1, n_threads - inter_op)
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        print(f"⚠️ Не удалось настроить потоки TensorFlow (runtime уже инициализирован): {e}")
+        return False
+    return True
+
+
+class TrainingOrchestrator:
+    """
+    Запускает независимые задачи обучения одновременно, деля между ними ядра CPU
+
+    Задача - функция func(n_threads), которая получает выделенное ей число потоков
+    (например, n_jobs для sklearn). Для задач вида 'tensorflow' пулы потоков
+    TensorFlow настраиваются централизованно: они общие для всего процесса.
+
+    Ограничение TensorFlow действует до конца процесса: после run() все операции
+    TensorFlow (в том числе predict при оценке модели) используют только эту долю ядер.
+    """
+
+    KINDS = ('sklearn', 'tensorflow')
+
+    def __init__(self, total_cpus=None):
+        """Инициализация с общим бюджетом ядер (по умолчанию - все ядра машины)"""
+        self.total_cpus = total_cpus or os.cpu_count() or 1
+        self.jobs = {}
+        self.timings = {}
+
+    def add_job(self, name, func, weight=1.0, kind='sklearn'):
+        """
+        Добавляет задачу обучения
+        weight: относительная доля ядер задачи
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+        self.jobs[name] = {'func': func, 'weight': weight, 'kind': kind}
+
+    def _timed(self, name, n_threads):
+        """Выполняет задачу и замеряет время"""
+        start = time.perf_counter()
+        result = self.jobs[name]['func'](n_threads)
+        self.timings[name] = time.perf_counter() - start
+        return result
+
+    def run(self):
+        """
+        Выполняет все задачи параллельно и возвращает словарь результатов
+        """
+        allocation = partition_cpus(
+            {name: job['weight'] for name, job in self.jobs.items()}, self.total_cpus
+        )
+
+        # Потоки TensorFlow общие для процесса - отдаем им суммарную долю TF-задач
+        tf_threads = sum(allocation[name] for name, job in self.jobs.items()
+                         if job['kind'] == 'tensorflow')
+        if tf_threads:
+            configure_tf_threads(tf_threads)
+
+        print(f"⚙️ Бюджет CPU: {self.total_cpus} ядер - "
+              + ", ".join(f"{name}: {n}" for name, n in allocation.items()))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.jobs), thread_name_prefix='train') as pool:
+            futures = {name: pool.submit(self._timed, name, allocation[name]) for name in self.jobs}
+            results = {name: future.result() for name, future in futures.items()}
+        total = time.perf_counter() - start
+
+        print("⏱️ Время обучения моделей:")
+        for name, elapsed in self.timings.items():
+            print(f"   - {name}: {elapsed:.1f} с ({allocation[name]} потоков)")
+        print(f"   - всего (параллельно): {total:.1f} с")
+
+        return results